@@ -9,55 +9,269 @@ import sys
 import uuid
 import json
 import time
+import functools
 import threading
+import queue
+import subprocess
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+from multiprocessing import shared_memory
 from pathlib import Path
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Request, request, jsonify, send_file
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import cv2
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
+# Render worker code lives in render.py so pickled tasks refer to a module without
+# side effects; spawn still re-runs this script in each worker, see the __mp_main__ check below
+from render import (ASCII_MARGIN, RENDER_WORKERS, RENDER_BATCH_SIZE, RenderContext, frame_to_gray,
+                    init_render_worker, render_frames)
 
-# Try to import moviepy for audio, fallback to ffmpeg
-try:
-    from moviepy.editor import VideoFileClip, ImageSequenceClip
-    AUDIO_SUPPORT = True
-    AUDIO_METHOD = "moviepy"
-    AUDIO_ERROR = None
-except ImportError as e:
-    # Try to use ffmpeg directly
-    import subprocess
+# Locate ffmpeg for encoding and audio: prefer the system binary, fall back to the
+# one moviepy installs through imageio-ffmpeg
+def find_ffmpeg():
+    """Return the ffmpeg executable and how it was found, or (None, error)"""
     try:
-        result = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True)
-        if result.returncode == 0:
-            AUDIO_SUPPORT = True
-            AUDIO_METHOD = "ffmpeg"
-            AUDIO_ERROR = None
-        else:
-            AUDIO_SUPPORT = False
-            AUDIO_METHOD = None
-            AUDIO_ERROR = "FFmpeg not found"
+        if subprocess.run(['ffmpeg', '-version'], capture_output=True).returncode == 0:
+            return 'ffmpeg', "ffmpeg"
+    except FileNotFoundError:
+        pass
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe(), "imageio-ffmpeg"
+    except ImportError:
+        return None, "Neither moviepy nor ffmpeg available"
+    except Exception as e:
+        return None, f"Unexpected error: {str(e)}"
+
+# Spawned render workers re-run this script as __mp_main__ before they import
+# render.py, so the server's start-up side effects are skipped in them
+IN_RENDER_WORKER = __name__ == '__mp_main__'
+
+if IN_RENDER_WORKER:
+    FFMPEG_BINARY, _ffmpeg_source = None, "Not probed in render workers"
+else:
+    FFMPEG_BINARY, _ffmpeg_source = find_ffmpeg()
+FFMPEG_AVAILABLE = FFMPEG_BINARY is not None
+AUDIO_SUPPORT = FFMPEG_AVAILABLE
+AUDIO_METHOD = _ffmpeg_source if FFMPEG_AVAILABLE else None
+AUDIO_ERROR = None if FFMPEG_AVAILABLE else _ffmpeg_source
+
+# Hardware H.264 encoders in order of preference
+HW_ENCODERS = ['h264_nvenc', 'h264_qsv', 'h264_videotoolbox', 'h264_amf']
+
+# Per-encoder rate control arguments by quality level
+QUALITY_PRESETS = {
+    'libx264': {
+        'high': ('-crf', '18', '-preset', 'medium'),
+        'medium': ('-crf', '23', '-preset', 'fast'),
+        'low': ('-crf', '28', '-preset', 'ultrafast'),
+    },
+    'h264_nvenc': {
+        'high': ('-preset', 'p5', '-rc', 'vbr', '-cq', '19', '-b:v', '0'),
+        'medium': ('-preset', 'p4', '-rc', 'vbr', '-cq', '23', '-b:v', '0'),
+        'low': ('-preset', 'p1', '-rc', 'vbr', '-cq', '28', '-b:v', '0'),
+    },
+    'h264_qsv': {
+        'high': ('-preset', 'medium', '-global_quality', '20'),
+        'medium': ('-preset', 'fast', '-global_quality', '25'),
+        'low': ('-preset', 'veryfast', '-global_quality', '30'),
+    },
+    'h264_videotoolbox': {
+        'high': ('-q:v', '65'),
+        'medium': ('-q:v', '55'),
+        'low': ('-q:v', '45'),
+    },
+    'h264_amf': {
+        'high': ('-quality', 'quality', '-rc', 'cqp', '-qp_i', '18', '-qp_p', '18'),
+        'medium': ('-quality', 'balanced', '-rc', 'cqp', '-qp_i', '23', '-qp_p', '23'),
+        'low': ('-quality', 'speed', '-rc', 'cqp', '-qp_i', '28', '-qp_p', '28'),
+    },
+}
+
+def encoder_works(encoder, args):
+    """Encode a single yuv420p test frame the way a conversion would"""
+    test_cmd = [
+        FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', 'color=black:s=256x256',
+        '-frames:v', '1', '-c:v', encoder, *args, '-pix_fmt', 'yuv420p', '-f', 'null', '-'
+    ]
+    return subprocess.run(test_cmd, capture_output=True).returncode == 0
+
+@functools.lru_cache(maxsize=None)
+def get_hw_encoder():
+    """Find a working hardware H.264 encoder once, or None to use libx264"""
+    if not FFMPEG_AVAILABLE:
+        return None
+    try:
+        result = subprocess.run([FFMPEG_BINARY, '-hide_banner', '-encoders'], capture_output=True, text=True)
     except FileNotFoundError:
-        AUDIO_SUPPORT = False
-        AUDIO_METHOD = None
-        AUDIO_ERROR = "Neither moviepy nor ffmpeg available"
-except Exception as e:
-    AUDIO_SUPPORT = False
-    AUDIO_METHOD = None
-    AUDIO_ERROR = f"Unexpected error: {str(e)}"
+        return None
+        
+    for encoder in HW_ENCODERS:
+        if encoder not in result.stdout:
+            continue
+        # Encoders can be compiled in without a usable device, and devices don't all
+        # support every rate control mode - try a frame with each quality's real arguments
+        if all(encoder_works(encoder, args) for args in QUALITY_PRESETS[encoder].values()):
+            return encoder
+    return None
+
+def video_encoder_settings(quality):
+    """ffmpeg video codec arguments for the requested quality, preferring a hardware encoder"""
+    encoder = get_hw_encoder() or 'libx264'
+    presets = QUALITY_PRESETS[encoder]
+    return ['-c:v', encoder, *presets.get(quality, presets['medium'])]
+
+class UploadRequest(Request):
+    """Request that writes uploaded file parts straight into UPLOAD_FOLDER while parsing"""
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Werkzeug would spool big parts to a temp file that we then copy again -
+        # parse into the upload folder instead, so saving the upload is a rename
+        part = tempfile.NamedTemporaryFile('wb+', dir=UPLOAD_FOLDER, suffix='.part', delete=False)
+        self.upload_parts = getattr(self, 'upload_parts', []) + [part]
+        return part
 
 app = Flask(__name__)
+app.request_class = UploadRequest
 CORS(app)
 
 # Configuration
 UPLOAD_FOLDER = Path('./uploads')
 OUTPUT_FOLDER = Path('./outputs')
-UPLOAD_FOLDER.mkdir(exist_ok=True)
-OUTPUT_FOLDER.mkdir(exist_ok=True)
+if not IN_RENDER_WORKER:
+    UPLOAD_FOLDER.mkdir(exist_ok=True)
+    OUTPUT_FOLDER.mkdir(exist_ok=True)
+MAX_UPLOAD_SIZE = 4 * 1024 ** 3  # Reject uploads larger than 4 GB
+app.config['UPLOAD_FOLDER'] = str(UPLOAD_FOLDER)
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_SIZE
+PIPELINE_QUEUE_SIZE = 8  # Frames buffered between decode, render and encode threads
+JOB_WORKERS = max(1, (os.cpu_count() or 2) // RENDER_WORKERS)  # Each job already renders on RENDER_WORKERS processes
+
+MAX_JOB_LOGS = 500  # Log lines kept per job
+JOB_RETENTION_SECONDS = 60 * 60  # Finished jobs are forgotten after an hour
+JOB_EVICTION_INTERVAL = 5 * 60  # Seconds between eviction sweeps
+
+class Job:
+    """State of one uploaded video and its conversion"""
+    __slots__ = ('id', 'filename', 'file_path', 'status', 'progress', 'logs', 'completed',
+                 'output_file', 'error', 'future', 'queued_at', 'finished_at')
+    
+    def __init__(self, id, filename, file_path):
+        self.id = id
+        self.filename = filename
+        self.file_path = file_path
+        self.status = 'uploaded'
+        self.progress = 0
+        self.logs = deque(maxlen=MAX_JOB_LOGS)  # Bounded so long conversions can't grow it forever
+        self.completed = False
+        self.output_file = None
+        self.error = None
+        self.future = None
+        self.queued_at = None
+        self.finished_at = None
+        
+    def finish(self, output_file=None, error=None):
+        """Mark the job as completed, successfully or with an error"""
+        self.output_file = output_file
+        self.error = error
+        self.finished_at = time.time()
+        self.completed = True
 
 # Store conversion jobs
 conversion_jobs = {}
 
+def evict_finished_jobs():
+    """Forget jobs that finished more than JOB_RETENTION_SECONDS ago, then reschedule"""
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    for job_id, job in list(conversion_jobs.items()):
+        if job.completed and job.finished_at < cutoff:
+            conversion_jobs.pop(job_id, None)
+    schedule_job_eviction()
+
+def schedule_job_eviction():
+    timer = threading.Timer(JOB_EVICTION_INTERVAL, evict_finished_jobs)
+    timer.daemon = True
+    timer.start()
+
+# Sweep in the server process only - render workers re-run this script as __mp_main__
+if not IN_RENDER_WORKER:
+    schedule_job_eviction()
+
+# Bounded pool of conversion threads - jobs beyond JOB_WORKERS wait in its queue
+job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='conversion')
+
+def put_until_stopped(q, item, stop):
+    """Put item on a bounded queue, giving up once the pipeline is stopped"""
+    while True:
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            if stop.is_set():
+                return
+
+def get_until_stopped(q, stop):
+    """Get the next item from a queue, returning None once the pipeline is stopped"""
+    while True:
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                return None
+
+@functools.lru_cache(maxsize=16)
+def get_font(font_size):
+    """Load the ASCII font once per size - parsing a TTF is too slow to repeat per job"""
+    # Try different font names
+    for font_name in ["consola.ttf", "cour.ttf", "arial.ttf"]:
+        try:
+            return ImageFont.truetype(font_name, font_size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+class FFmpegWriter:
+    """Encode raw BGR frames by piping them into ffmpeg - a drop-in for cv2.VideoWriter"""
+    def __init__(self, cmd):
+        self.stderr = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self.stderr)
+        
+    def isOpened(self):
+        return self.proc.poll() is None
+        
+    def write(self, frame):
+        try:
+            self.proc.stdin.write(frame.data)
+        except BrokenPipeError:
+            self.proc.wait()
+            raise Exception(f"ffmpeg encoder exited: {self.error_output()}")
+            
+    def release(self):
+        """Finish encoding and raise if ffmpeg failed"""
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self.proc.wait()
+        if returncode != 0:
+            raise Exception(f"ffmpeg encoder failed: {self.error_output()}")
+        self.stderr.close()
+        
+    def kill(self):
+        """Abort encoding, e.g. after a failed conversion"""
+        if self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait()
+        self.stderr.close()
+        
+    def error_output(self):
+        self.stderr.seek(0)
+        return self.stderr.read().decode(errors='replace').strip()
+
 class ASCIIVideoConverter:
     def __init__(self):
         # ASCII character sets - samme som dit script
@@ -70,84 +284,83 @@ class ASCIIVideoConverter:
     def log_message(self, job_id, message):
         """Log message for specific job"""
         if job_id in conversion_jobs:
-            conversion_jobs[job_id]['logs'].append(f"[{time.strftime('%H:%M:%S')}] {message}")
+            conversion_jobs[job_id].logs.append(f"[{time.strftime('%H:%M:%S')}] {message}")
             print(f"[{job_id}] {message}")
         
     def update_progress(self, job_id, progress, status):
         """Update job progress"""
-        if job_id in conversion_jobs:
-            conversion_jobs[job_id]['progress'] = progress
-            conversion_jobs[job_id]['status'] = status
+        job = conversion_jobs.get(job_id)
+        if job is not None:
+            job.progress = progress
+            job.status = status
             
-    def frame_to_ascii(self, frame, width, charset, contrast):
-        """Convert a video frame to ASCII art - samme som dit script"""
-        # Resize frame
-        height, width_orig = frame.shape[:2]
-        aspect_ratio = height / width_orig
-        ascii_height = int(width * aspect_ratio * 0.45)
+    @staticmethod
+    def build_index_lut(charset, contrast):
+        """Build a 256-entry table mapping a gray value straight to its charset index"""
+        # Contrast is applied like cv2.convertScaleAbs, then scaled onto the charset
+        contrasted = np.clip(np.rint(np.abs(np.arange(256) * contrast)), 0, 255).astype(np.uint32)
+        return (contrasted * (len(charset) - 1) // 255).astype(np.uint8)
         
-        frame_resized = cv2.resize(frame, (width, ascii_height))
+    def build_glyph_atlas(self, charset, font_size):
+        """Rasterize every charset character once into a (chars, cell_h, cell_w, 3) BGR array"""
+        char_width = max(1, round(font_size * 0.6))  # Estimate character width
+        char_height = int(font_size * 1.2)  # Line height
         
-        # Convert to grayscale
-        if len(frame_resized.shape) == 3:
-            gray = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = frame_resized
-            
-        # Apply contrast
-        gray = cv2.convertScaleAbs(gray, alpha=contrast, beta=0)
+        font = get_font(font_size)
         
-        # Convert to ASCII
-        ascii_lines = []
-        for y in range(ascii_height):
-            row = []
-            for x in range(width):
-                pixel_value = gray[y, x]
-                char_index = int((pixel_value / 255) * (len(charset) - 1))
-                row.append(charset[char_index])
-            ascii_lines.append(''.join(row))
+        glyphs = np.zeros((len(charset), char_height, char_width, 3), dtype=np.uint8)
+        for i, char in enumerate(charset):
+            tile = Image.new('RGB', (char_width, char_height), color='black')
+            ImageDraw.Draw(tile).text((0, 0), char, fill='lime', font=font)
+            # Store glyphs in OpenCV's BGR order so rendered frames need no conversion
+            glyphs[i] = np.array(tile)[:, :, ::-1]
             
-        return ascii_lines
+        return glyphs
         
-    def ascii_to_image(self, ascii_lines, font_size):
-        """Convert ASCII text to image - samme som dit script"""
-        # Calculate image size
-        max_width = max(len(line) for line in ascii_lines)
-        char_width = font_size * 0.6  # Estimate character width
-        char_height = font_size * 1.2  # Line height
+    def create_canvas(self, ascii_width, ascii_height, glyphs):
+        """Allocate the output frame buffer for an ASCII grid"""
+        char_height, char_width = glyphs.shape[1:3]
+        img_width = ascii_width * char_width + 2 * ASCII_MARGIN
+        img_height = ascii_height * char_height + 2 * ASCII_MARGIN
         
-        img_width = int(max_width * char_width) + 20
-        img_height = int(len(ascii_lines) * char_height) + 20
+        # H.264 with yuv420p needs even dimensions - pad the right/bottom border
+        img_width += img_width % 2
+        img_height += img_height % 2
+        return np.zeros((img_height, img_width, 3), dtype=np.uint8)
         
-        # Create image
-        img = Image.new('RGB', (img_width, img_height), color='black')
-        draw = ImageDraw.Draw(img)
+    def mux_audio(self, job_id, video_path, input_path, output_path):
+        """Add the original audio to an encoded ASCII video without re-encoding the video"""
+        mux_cmd = [
+            FFMPEG_BINARY, '-y', '-hide_banner', '-loglevel', 'error',
+            '-i', str(video_path),
+            '-i', input_path,
+            '-map', '0:v:0',
+            '-map', '1:a:0?',
+            '-c:v', 'copy',
+        ]
+        mux_tail = ['-shortest', '-movflags', '+faststart', str(output_path)]
         
-        # Try to load font
-        try:
-            # Try different font names
-            for font_name in ["consola.ttf", "cour.ttf", "arial.ttf"]:
-                try:
-                    font = ImageFont.truetype(font_name, font_size)
-                    break
-                except:
-                    continue
-            else:
-                font = ImageFont.load_default()
-        except:
-            font = ImageFont.load_default()
-        
-        # Draw ASCII text
-        y_pos = 10
-        for line in ascii_lines:
-            draw.text((10, y_pos), line, fill='lime', font=font)
-            y_pos += int(char_height)
+        # Copy the source audio as-is; only re-encode to AAC if MP4 can't hold it
+        result = subprocess.run(mux_cmd + ['-c:a', 'copy'] + mux_tail, capture_output=True, text=True)
+        if result.returncode == 0:
+            self.log_message(job_id, "✅ Audio successfully added using ffmpeg (stream copy)!")
+            return True
             
-        return np.array(img)
+        if "Could not find tag" in result.stderr or "not currently supported in container" in result.stderr:
+            self.log_message(job_id, "ℹ Source audio codec not supported in MP4, re-encoding audio to AAC...")
+            result = subprocess.run(mux_cmd + ['-c:a', 'aac', '-b:a', '128k'] + mux_tail, capture_output=True, text=True)
+            if result.returncode == 0:
+                self.log_message(job_id, "✅ Audio successfully added using ffmpeg!")
+                return True
+                
+        self.log_message(job_id, f"⚠ FFmpeg audio pipeline failed: {result.stderr}")
+        return False
         
     def convert_video(self, job_id, input_path, settings):
         """Convert video to ASCII - baseret på dit script"""
+        out = None
         try:
+            self.update_progress(job_id, 0, "converting")
             self.log_message(job_id, f"Starting conversion of: {Path(input_path).name}")
             
             # Get settings
@@ -180,194 +393,218 @@ class ASCIIVideoConverter:
                 
             # Create output filename
             input_file = Path(input_path)
-            temp_video_path = OUTPUT_FOLDER / f"{job_id}_temp.mp4"
+            video_only_path = OUTPUT_FOLDER / f"{job_id}_video.mp4"
             final_output_path = OUTPUT_FOLDER / f"{job_id}_ascii.mp4"
             
             self.log_message(job_id, f"Output will be: {final_output_path.name}")
             
             # Get first frame to determine output size
-            ret, frame = cap.read()
+            ret, first_frame = cap.read()
             if not ret:
                 raise Exception("Could not read first frame")
                 
-            ascii_lines = self.frame_to_ascii(frame, ascii_width, charset, contrast)
-            ascii_img = self.ascii_to_image(ascii_lines, font_size)
-            output_height, output_width = ascii_img.shape[:2]
+            # Derive the ASCII grid size once - it is the same for every frame
+            index_lut = self.build_index_lut(charset, contrast)
+            ascii_height = RenderContext.grid_height(first_frame.shape, ascii_width)
+            
+            # Rasterize the charset once and size the output frames from it
+            glyphs = self.build_glyph_atlas(charset, font_size)
+            canvas = self.create_canvas(ascii_width, ascii_height, glyphs)
+            output_height, output_width = canvas.shape[:2]
             
             self.log_message(job_id, f"Output video size: {output_width}x{output_height}")
             
-            # Setup video writer (temporary file without audio)
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(str(temp_video_path), fourcc, fps, 
-                                (output_width, output_height))
+            # Setup video writer. With ffmpeg, raw frames are piped straight into a
+            # single H.264 encode; audio is stream-copied on afterwards so a container
+            # mismatch can be retried without re-rendering. Without ffmpeg, fall back
+            # to a video-only OpenCV mp4v file.
+            use_ffmpeg = FFMPEG_AVAILABLE
+            if use_ffmpeg:
+                video_settings = video_encoder_settings(quality)
+                    
+                ffmpeg_cmd = [
+                    FFMPEG_BINARY, '-y', '-hide_banner', '-loglevel', 'error',
+                    '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+                    '-s', f"{output_width}x{output_height}", '-r', str(fps),
+                    '-i', '-',
+                ]
+                ffmpeg_cmd += video_settings + ['-pix_fmt', 'yuv420p']
+                if include_audio:
+                    ffmpeg_cmd += [str(video_only_path)]
+                else:
+                    ffmpeg_cmd += ['-movflags', '+faststart', str(final_output_path)]
+                
+                self.log_message(job_id, f"Encoding ASCII frames to H.264 MP4 with ffmpeg ({video_settings[1]})...")
+                out = FFmpegWriter(ffmpeg_cmd)
+            else:
+                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                out = cv2.VideoWriter(str(final_output_path), fourcc, fps, 
+                                    (output_width, output_height))
             
             if not out.isOpened():
                 raise Exception("Could not create output video file")
             
-            # Reset video to beginning
-            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            
             frame_count = 0
+            reused_frames = 0
             
-            # Generate ASCII video frames
-            self.log_message(job_id, "Generating ASCII video frames...")
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
+            # Decode, ASCII-render and encode run concurrently: a reader thread feeds
+            # downscaled gray grids to this thread, which hands rendered frames to a
+            # writer thread. Bounded queues keep memory constant when one stage falls behind.
+            read_q = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            write_q = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            stop = threading.Event()
+            errors = []
+            
+            def read_frames():
+                try:
+                    # Downscale right after decoding so only the small gray grids are
+                    # queued and pickled to the render workers, not full frames
+                    grid_size = (ascii_width, ascii_height)
+                    gray_full = np.empty(first_frame.shape[:2], dtype=np.uint8)
+                    # Feed the already decoded first frame instead of seeking back to it
+                    put_until_stopped(read_q, frame_to_gray(first_frame, grid_size, gray_full), stop)
+                    while not stop.is_set():
+                        ret, frame = cap.read()
+                        if not ret:
+                            break
+                        put_until_stopped(read_q, frame_to_gray(frame, grid_size, gray_full), stop)
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    put_until_stopped(read_q, None, stop)
                     
-                # Convert frame to ASCII
-                ascii_lines = self.frame_to_ascii(frame, ascii_width, charset, contrast)
-                ascii_img = self.ascii_to_image(ascii_lines, font_size)
-                
-                # Convert RGB to BGR for OpenCV
-                ascii_img_bgr = cv2.cvtColor(ascii_img, cv2.COLOR_RGB2BGR)
-                
-                # Write frame
-                out.write(ascii_img_bgr)
+            def write_frames():
+                try:
+                    while True:
+                        img = get_until_stopped(write_q, stop)
+                        if img is None:
+                            break
+                        out.write(img)
+                except Exception as e:
+                    errors.append(e)
+                    stop.set()
+                    
+            # Render batches of gray grids in worker processes that share the glyph atlas
+            # through shared memory. Batches are collected in submission order and only
+            # a bounded window is in flight, so frames stream to the writer in sequence.
+            atlas_shm = shared_memory.SharedMemory(create=True, size=glyphs.nbytes)
+            shared_glyphs = np.ndarray(glyphs.shape, dtype=glyphs.dtype, buffer=atlas_shm.buf)
+            shared_glyphs[:] = glyphs
+            del shared_glyphs
+            executor = ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_render_worker,
+                initargs=(atlas_shm.name, glyphs.shape, (ascii_height, ascii_width), canvas.shape, index_lut)
+            )
+            pending = deque()
+            
+            reader = threading.Thread(target=read_frames, daemon=True)
+            writer = threading.Thread(target=write_frames, daemon=True)
+            reader.start()
+            writer.start()
+            
+            def write_batch(future):
+                nonlocal frame_count, reused_frames
+                rendered, repeats = future.result()
+                images = iter(rendered)
+                for repeat in repeats:
+                    # Unchanged frames weren't redrawn - write the previous image again
+                    if repeat:
+                        reused_frames += 1
+                    else:
+                        ascii_img_bgr = next(images)
+                        
+                    # Hand frame to writer thread
+                    put_until_stopped(write_q, ascii_img_bgr, stop)
+                    
+                    frame_count += 1
+                    progress = (frame_count / total_frames) * 50  # First 50% for video generation
+                    self.update_progress(job_id, progress, f"Generating ASCII frames {frame_count}/{total_frames}")
+                    
+                    if frame_count % 30 == 0:  # Log every 30 frames
+                        self.log_message(job_id, f"Generated {frame_count}/{total_frames} ASCII frames ({progress:.1f}%)")
+            
+            # Generate ASCII video frames
+            self.log_message(job_id, f"Generating ASCII video frames using {RENDER_WORKERS} render workers...")
+            try:
+                finished = False
+                while not finished and not stop.is_set():
+                    batch = []
+                    while len(batch) < RENDER_BATCH_SIZE:
+                        gray = get_until_stopped(read_q, stop)
+                        if gray is None:
+                            finished = True
+                            break
+                        batch.append(gray)
+                        
+                    if batch:
+                        pending.append(executor.submit(render_frames, batch))
+                        
+                    while pending and (finished or len(pending) >= 2 * RENDER_WORKERS):
+                        write_batch(pending.popleft())
+            except Exception:
+                stop.set()
+                raise
+            finally:
+                for future in pending:
+                    future.cancel()
+                executor.shutdown(wait=True)
+                atlas_shm.close()
+                atlas_shm.unlink()
+                put_until_stopped(write_q, None, stop)
+                reader.join()
+                writer.join()
                 
-                frame_count += 1
-                progress = (frame_count / total_frames) * 50  # First 50% for video generation
-                self.update_progress(job_id, progress, f"Generating ASCII frames {frame_count}/{total_frames}")
+            if errors:
+                raise errors[0]
                 
-                if frame_count % 30 == 0:  # Log every 30 frames
-                    self.log_message(job_id, f"Generated {frame_count}/{total_frames} ASCII frames ({progress:.1f}%)")
+            if reused_frames:
+                self.log_message(job_id, f"Reused {reused_frames} unchanged frames without redrawing")
                     
             # Cleanup video capture and writer
             cap.release()
             out.release()
             
-            self.log_message(job_id, f"ASCII video frames generated: {temp_video_path.name}")
-            
-            # Add audio if requested and supported
-            if include_audio and AUDIO_SUPPORT:
+            self.log_message(job_id, "ASCII video encoded")
+            if include_audio:
                 self.log_message(job_id, f"Adding original audio using {AUDIO_METHOD}...")
                 self.update_progress(job_id, 75, "Adding audio to ASCII video...")
-                
-                try:
-                    if AUDIO_METHOD == "moviepy":
-                        # Use moviepy method
-                        original_clip = VideoFileClip(input_path)
-                        ascii_clip = VideoFileClip(str(temp_video_path))
-                        
-                        if original_clip.audio is not None:
-                            ascii_with_audio = ascii_clip.set_audio(original_clip.audio)
-                            ascii_with_audio.write_videofile(
-                                str(final_output_path),
-                                codec='libx264',
-                                audio_codec='aac',
-                                verbose=False,
-                                logger=None
-                            )
-                            ascii_with_audio.close()
-                            self.log_message(job_id, "✅ Audio successfully added using moviepy!")
-                        else:
-                            temp_video_path.rename(final_output_path)
-                            self.log_message(job_id, "ℹ Original video has no audio")
-                            
-                        original_clip.close()
-                        ascii_clip.close()
-                        
-                    elif AUDIO_METHOD == "ffmpeg":
-                        # Use ffmpeg directly with quality settings
-                        self.log_message(job_id, "Using ffmpeg to create MP4 with audio and quality settings...")
-
-                        # Map requested quality to CRF/preset
-                        if quality == 'high':
-                            video_settings = ['-c:v', 'libx264', '-crf', '18', '-preset', 'medium']
-                        elif quality == 'medium':
-                            video_settings = ['-c:v', 'libx264', '-crf', '23', '-preset', 'fast']
-                        else:
-                            video_settings = ['-c:v', 'libx264', '-crf', '28', '-preset', 'ultrafast']
-
-                        ffmpeg_cmd = [
-                            'ffmpeg', '-y',
-                            '-i', str(temp_video_path),
-                            '-i', input_path,
-                        ] + video_settings + [
-                            '-c:a', 'aac',
-                            '-b:a', '128k',
-                            '-map', '0:v:0',
-                            '-map', '1:a:0',
-                            '-shortest',
-                            '-movflags', '+faststart',
-                            str(final_output_path)
-                        ]
-                        
-                        result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True)
-                        
-                        if result.returncode == 0:
-                            self.log_message(job_id, "✅ Audio successfully added using ffmpeg!")
-                        else:
-                            # Try simpler command if complex one fails
-                            self.log_message(job_id, f"⚠ FFmpeg quality pipeline failed, trying simple mapping...")
-                            simple_cmd = [
-                                'ffmpeg', '-y',
-                                '-i', str(temp_video_path),
-                                '-i', input_path,
-                                '-c:v', 'libx264',
-                                '-c:a', 'aac',
-                                '-map', '0:v:0',
-                                '-map', '1:a:0',
-                                '-shortest',
-                                str(final_output_path)
-                            ]
-                            result2 = subprocess.run(simple_cmd, capture_output=True, text=True)
-                            if result2.returncode == 0:
-                                self.log_message(job_id, "✅ MP4 with audio created using simple ffmpeg!")
-                            else:
-                                self.log_message(job_id, f"⚠ FFmpeg audio pipeline failed: {result.stderr}")
-                                self.log_message(job_id, "Saving video without audio...")
-                                temp_video_path.rename(final_output_path)
-                    
-                    # Remove temporary file
-                    if temp_video_path.exists():
-                        temp_video_path.unlink()
-                        
-                except Exception as audio_error:
-                    self.log_message(job_id, f"⚠ Audio processing failed: {audio_error}")
+                if not self.mux_audio(job_id, video_only_path, input_path, final_output_path):
                     self.log_message(job_id, "Saving video without audio...")
-                    if temp_video_path.exists():
-                        temp_video_path.rename(final_output_path)
+                    video_only_path.replace(final_output_path)
+                elif video_only_path.exists():
+                    video_only_path.unlink()
+            elif not use_ffmpeg:
+                self.log_message(job_id, "⚠ ffmpeg not available - saved mp4v video only")
             else:
-                # No audio requested. Re-encode to MP4 with requested quality if ffmpeg is available
-                try:
-                    import subprocess as _sp
-                    self.log_message(job_id, "Re-encoding ASCII MP4 without audio using ffmpeg...")
-                    if quality == 'high':
-                        video_settings = ['-c:v', 'libx264', '-crf', '18', '-preset', 'medium']
-                    elif quality == 'medium':
-                        video_settings = ['-c:v', 'libx264', '-crf', '23', '-preset', 'fast']
-                    else:
-                        video_settings = ['-c:v', 'libx264', '-crf', '28', '-preset', 'ultrafast']
-
-                    cmd = ['ffmpeg', '-y', '-i', str(temp_video_path)] + video_settings + ['-movflags', '+faststart', str(final_output_path)]
-                    result = _sp.run(cmd, capture_output=True, text=True)
-                    if result.returncode != 0:
-                        self.log_message(job_id, f"⚠ ffmpeg re-encode failed: {result.stderr}")
-                        temp_video_path.rename(final_output_path)
-                except Exception as _e:
-                    self.log_message(job_id, f"⚠ ffmpeg not available for re-encode: {_e}")
-                    temp_video_path.rename(final_output_path)
-                if not include_audio:
-                    self.log_message(job_id, "Audio not requested - video only")
+                self.log_message(job_id, "Audio not requested - video only")
                 
             self.update_progress(job_id, 100, "Conversion completed!")
-            conversion_jobs[job_id]['output_file'] = str(final_output_path)
-            conversion_jobs[job_id]['completed'] = True
+            conversion_jobs[job_id].finish(output_file=str(final_output_path))
             self.log_message(job_id, f"SUCCESS: ASCII video created!")
             self.log_message(job_id, f"File saved as: {final_output_path}")
             
         except Exception as e:
             error_msg = f"Conversion failed: {str(e)}"
             self.log_message(job_id, f"ERROR: {error_msg}")
-            conversion_jobs[job_id]['error'] = error_msg
-            conversion_jobs[job_id]['completed'] = True
+            conversion_jobs[job_id].finish(error=error_msg)
             
-            # Cleanup temp file if it exists
+            # Stop the encoder and remove the partial video if one was started
+            if isinstance(out, FFmpegWriter):
+                out.kill()
+            elif out is not None:
+                out.release()
+            try:
+                if out is not None and final_output_path.exists():
+                    final_output_path.unlink()
+            except:
+                pass
+                
+            # Cleanup intermediate file if it exists
             try:
-                if temp_video_path.exists():
-                    temp_video_path.unlink()
+                if video_only_path.exists():
+                    video_only_path.unlink()
             except:
                 pass
 
@@ -381,7 +618,8 @@ def health_check():
         'status': 'ok',
         'audio_support': AUDIO_SUPPORT,
         'audio_method': AUDIO_METHOD,
-        'audio_error': AUDIO_ERROR
+        'audio_error': AUDIO_ERROR,
+        'video_encoder': (get_hw_encoder() or 'libx264') if FFMPEG_AVAILABLE else None
     })
 
 @app.route('/api/upload', methods=['POST'])
@@ -400,20 +638,14 @@ def upload_video():
     # Save uploaded file
     filename = secure_filename(file.filename)
     file_path = UPLOAD_FOLDER / f"{job_id}_{filename}"
-    file.save(file_path)
+    # The body was already parsed into a part file in UPLOAD_FOLDER - just move it
+    file.stream.close()
+    os.replace(file.stream.name, file_path)
     
     # Create job record
-    conversion_jobs[job_id] = {
-        'id': job_id,
-        'filename': filename,
-        'file_path': str(file_path),
-        'status': 'uploaded',
-        'progress': 0,
-        'logs': [f"[{time.strftime('%H:%M:%S')}] File uploaded: {filename}"],
-        'completed': False,
-        'output_file': None,
-        'error': None
-    }
+    job = Job(job_id, filename, str(file_path))
+    job.logs.append(f"[{time.strftime('%H:%M:%S')}] File uploaded: {filename}")
+    conversion_jobs[job_id] = job
     
     return jsonify({
         'job_id': job_id,
@@ -421,6 +653,19 @@ def upload_video():
         'message': 'File uploaded successfully'
     })
 
+@app.teardown_request
+def remove_unsaved_uploads(error=None):
+    """Delete part files of uploads that were rejected or aborted"""
+    for part in getattr(request, 'upload_parts', ()):
+        part.close()
+        if os.path.exists(part.name):
+            os.unlink(part.name)
+
+@app.errorhandler(413)
+def upload_too_large(error):
+    """Reject uploads above MAX_CONTENT_LENGTH"""
+    return jsonify({'error': f"File too large (max {MAX_UPLOAD_SIZE // 1024 ** 3} GB)"}), 413
+
 @app.route('/api/convert', methods=['POST'])
 def start_conversion():
     """Start ASCII video conversion"""
@@ -431,24 +676,38 @@ def start_conversion():
     if not job_id or job_id not in conversion_jobs:
         return jsonify({'error': 'Invalid job ID'}), 400
     
-    if conversion_jobs[job_id]['completed']:
+    job = conversion_jobs[job_id]
+    if job.completed:
         return jsonify({'error': 'Job already completed'}), 400
     
-    # Start conversion in background thread
-    def run_conversion():
-        converter.convert_video(job_id, conversion_jobs[job_id]['file_path'], settings)
-    
-    thread = threading.Thread(target=run_conversion)
-    thread.daemon = True
-    thread.start()
+    if job.future is not None:
+        return jsonify({'error': 'Job already started'}), 400
     
-    conversion_jobs[job_id]['status'] = 'converting'
+    # Queue conversion on the bounded job pool
+    job.status = 'queued'
+    job.queued_at = time.time()
+    job.future = job_executor.submit(converter.convert_video, job_id, job.file_path, settings)
     
     return jsonify({
         'message': 'Conversion started',
-        'job_id': job_id
+        'job_id': job_id,
+        'queue_position': get_queue_position(job_id)
     })
 
+def get_queue_position(job_id):
+    """1-based position of a job waiting for a free conversion worker, or None once it runs"""
+    future = conversion_jobs[job_id].future
+    if future is None or future.running() or future.done():
+        return None
+    
+    waiting = [
+        job for job in list(conversion_jobs.values())
+        if job.future is not None and not job.future.running() and not job.future.done()
+    ]
+    waiting.sort(key=lambda job: job.queued_at)
+    waiting_ids = [job.id for job in waiting]
+    return waiting_ids.index(job_id) + 1 if job_id in waiting_ids else None
+
 @app.route('/api/status/<job_id>', methods=['GET'])
 def get_job_status(job_id):
     """Get conversion job status"""
@@ -458,13 +717,14 @@ def get_job_status(job_id):
     job = conversion_jobs[job_id]
     return jsonify({
         'job_id': job_id,
-        'filename': job['filename'],
-        'status': job['status'],
-        'progress': job['progress'],
-        'completed': job['completed'],
-        'error': job['error'],
-        'logs': job['logs'][-10:],  # Return last 10 log entries
-        'has_output': job['output_file'] is not None
+        'filename': job.filename,
+        'status': job.status,
+        'progress': job.progress,
+        'completed': job.completed,
+        'error': job.error,
+        'logs': list(job.logs)[-10:],  # Return last 10 log entries
+        'has_output': job.output_file is not None,
+        'queue_position': get_queue_position(job_id)
     })
 
 @app.route('/api/download/<job_id>', methods=['GET'])
@@ -474,17 +734,17 @@ def download_result(job_id):
         return jsonify({'error': 'Job not found'}), 404
     
     job = conversion_jobs[job_id]
-    if not job['completed'] or not job['output_file']:
+    if not job.completed or not job.output_file:
         return jsonify({'error': 'Conversion not completed or no output file'}), 400
     
-    output_path = Path(job['output_file'])
+    output_path = Path(job.output_file)
     if not output_path.exists():
         return jsonify({'error': 'Output file not found'}), 404
     
     return send_file(
         output_path,
         as_attachment=True,
-        download_name=f"ascii_{job['filename']}"
+        download_name=f"ascii_{job.filename}"
     )
 
 @app.route('/api/logs/<job_id>', methods=['GET'])
@@ -495,7 +755,7 @@ def get_job_logs(job_id):
     
     return jsonify({
         'job_id': job_id,
-        'logs': conversion_jobs[job_id]['logs']
+        'logs': list(conversion_jobs[job_id].logs)
     })
 
 if __name__ == '__main__':
@@ -506,6 +766,8 @@ if __name__ == '__main__':
         print(f"Audio method: {AUDIO_METHOD}")
     else:
         print(f"Audio error: {AUDIO_ERROR}")
+    if FFMPEG_AVAILABLE:
+        print(f"Video encoder: {get_hw_encoder() or 'libx264'}")
     print("Starting Flask server...")
     
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,134 @@
+"""
+Frame rendering for the ASCII Video Converter Backend
+
+Kept free of side effects at import time: the render worker processes import
+this module to run init_render_worker and render_frames.
+"""
+
+import os
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+
+# Numba is optional - when present the glyph blit is JIT-compiled into a parallel loop
+try:
+    import numba
+    from numba import njit, prange
+    NUMBA_SUPPORT = True
+except ImportError:
+    NUMBA_SUPPORT = False
+
+# Configuration
+ASCII_MARGIN = 10  # Black border around the ASCII text in output frames
+RENDER_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # Leave one core for decode/encode
+RENDER_BATCH_SIZE = 4  # Frames sent to a render worker per task
+
+if NUMBA_SUPPORT:
+    @njit(parallel=True, cache=True)
+    def blit_glyphs(text_area, glyphs, idx):
+        """Copy every cell's glyph into the text area, rows in parallel"""
+        rows, cols = idx.shape
+        char_height, char_width = glyphs.shape[1], glyphs.shape[2]
+        for y in prange(rows):
+            y0 = y * char_height
+            for x in range(cols):
+                x0 = x * char_width
+                text_area[y0:y0 + char_height, x0:x0 + char_width] = glyphs[idx[y, x]]
+
+def frame_to_gray(frame, grid_size, gray_full=None):
+    """Downscale a decoded frame to one gray value per ASCII cell
+    
+    Runs in the decode thread (OpenCV releases the GIL), so only the small
+    grid is sent to a render worker instead of the full-resolution frame.
+    """
+    # Convert to grayscale first so the resize only touches one channel
+    if len(frame.shape) == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray_full)
+        
+    # Box-filter downscale: averages every source pixel per cell, so the ASCII
+    # doesn't shimmer between frames the way 4-tap bilinear sampling does
+    return cv2.resize(frame, grid_size, interpolation=cv2.INTER_AREA)
+
+class RenderContext:
+    """Per-job ASCII grid geometry and scratch buffers, set up once from the first frame"""
+    @staticmethod
+    def grid_height(frame_shape, ascii_width):
+        """Rows of the ASCII grid for a frame, corrected for the tall character cells"""
+        height, width_orig = frame_shape[:2]
+        return int(ascii_width * (height / width_orig) * 0.45)
+        
+    def __init__(self, grid_shape, index_lut, glyphs=None):
+        self.ascii_height, self.ascii_width = grid_shape
+        self.index_lut = index_lut
+        self.glyphs = glyphs
+        
+        # Buffers reused for every frame so the hot loop doesn't allocate
+        self.idx = np.empty(grid_shape, dtype=np.uint8)
+        if glyphs is not None and not NUMBA_SUPPORT:
+            self.tiles = np.empty(tuple(grid_shape) + glyphs.shape[1:], dtype=np.uint8)
+            
+    def gray_to_indices(self, gray):
+        """Map a gray grid to charset indices (overwritten by the next call)"""
+        # Apply contrast and map pixels to char indices in a single table lookup pass
+        return cv2.LUT(gray, self.index_lut, dst=self.idx)
+        
+    def render_ascii(self, idx, canvas):
+        """Compose an ASCII frame into canvas by blitting pre-rendered glyphs"""
+        rows, cols = idx.shape
+        char_height, char_width = self.glyphs.shape[1:3]
+        
+        text_area = canvas[ASCII_MARGIN:ASCII_MARGIN + rows * char_height,
+                           ASCII_MARGIN:ASCII_MARGIN + cols * char_width]
+        if NUMBA_SUPPORT:
+            blit_glyphs(text_area, self.glyphs, idx)
+            return canvas
+            
+        # View the text area as a (rows, cell_h, cols, cell_w) grid of cells and
+        # fill every cell with its glyph in a single vectorized copy
+        cells = text_area.reshape(rows, char_height, cols, char_width, 3)
+        np.take(self.glyphs, idx, axis=0, out=self.tiles, mode='clip')
+        np.copyto(cells, self.tiles.transpose(0, 2, 1, 3, 4))
+        
+        return canvas
+
+# Per-process state for render workers, set up once by init_render_worker
+_render_state = {}
+
+def init_render_worker(atlas_shm_name, atlas_shape, grid_shape, canvas_shape, index_lut):
+    """Attach a render worker process to the shared glyph atlas and set up its buffers"""
+    atlas_shm = shared_memory.SharedMemory(name=atlas_shm_name)
+    _render_state['atlas_shm'] = atlas_shm  # Keep the mapping alive for the worker's lifetime
+    glyphs = np.ndarray(atlas_shape, dtype=np.uint8, buffer=atlas_shm.buf)
+    _render_state['context'] = RenderContext(grid_shape, index_lut, glyphs)
+    if NUMBA_SUPPORT:
+        # Share the cores with the other render workers instead of each using all of them
+        numba.set_num_threads(max(1, min(numba.config.NUMBA_NUM_THREADS, (os.cpu_count() or 2) // RENDER_WORKERS)))
+    # One reusable output buffer per batch slot; only the text area is ever redrawn
+    _render_state['canvases'] = np.zeros((RENDER_BATCH_SIZE,) + tuple(canvas_shape), dtype=np.uint8)
+    _render_state['prev_idx'] = np.empty_like(_render_state['context'].idx)
+
+def render_frames(grays):
+    """Render a batch of downscaled gray grids to BGR ASCII frames in a worker process
+    
+    Returns the rendered images plus one flag per frame telling whether it
+    repeated the previous frame's ASCII grid and was skipped.
+    """
+    context = _render_state['context']
+    canvases = _render_state['canvases']
+    prev_idx = _render_state['prev_idx']
+    
+    rendered = 0
+    repeats = []
+    for i, gray in enumerate(grays):
+        idx = context.gray_to_indices(gray)
+        # Static shots map to the same grid - skip the blit and the transfer back
+        if i and np.array_equal(idx, prev_idx):
+            repeats.append(True)
+            continue
+        np.copyto(prev_idx, idx)
+        context.render_ascii(idx, canvases[rendered])
+        rendered += 1
+        repeats.append(False)
+        
+    # Glyphs are already BGR, so the batch goes back as one array without conversion
+    return canvases[:rendered], repeats
@@ -0,0 +1,213 @@
+"""
+Frame rendering for the ASCII Video Converter
+
+Kept free of side effects at import time: the render worker processes import
+this module to run init_render_worker and render_frames.
+"""
+
+import os
+import functools
+import cv2
+import numpy as np
+
+# Pillow is optional - it draws nicer TrueType glyphs for the atlas, otherwise
+# OpenCV's built-in Hershey font is used
+try:
+    from PIL import Image, ImageDraw, ImageFont
+    PIL_SUPPORT = True
+except ImportError:
+    PIL_SUPPORT = False
+
+# Optional JIT compiler for the per-cell render loop
+try:
+    import numba
+    from numba import njit, prange
+    NUMBA_SUPPORT = True
+except ImportError:
+    NUMBA_SUPPORT = False
+
+# Configuration
+RENDER_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # Leave one core for decode/encode
+RENDER_BATCH_SIZE = 4  # Frames rendered together per worker task
+ASCII_MARGIN = 10  # Black border around the ASCII text in output frames
+
+# Gray value -> charset index tables, built once per (charset, contrast) in each process
+_lut_cache = {}
+
+def get_index_lut(charset, contrast):
+    """256-entry gray value -> charset index table with contrast folded in"""
+    key = (charset, contrast)
+    lut = _lut_cache.get(key)
+    if lut is None:
+        char_indices = np.array([int((p / 255) * (len(charset) - 1)) for p in range(256)], dtype=np.uint8)
+        # Contrast rounded and saturated the same way cv2.convertScaleAbs does it
+        contrasted = np.clip(np.rint(np.abs(np.arange(256) * contrast)), 0, 255).astype(np.intp)
+        lut = _lut_cache[key] = char_indices[contrasted]
+    return lut
+
+@functools.lru_cache(maxsize=16)
+def load_font(font_size):
+    """Load the first available monospace-ish font once per size, falling back to PIL's default"""
+    # Try different font names
+    for font_name in ["consola.ttf", "cour.ttf", "arial.ttf"]:
+        try:
+            return ImageFont.truetype(font_name, font_size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+# Coverage of the block shading characters, drawn as dither patterns without Pillow
+BLOCK_SHADES = {'█': 1.0, '▓': 0.75, '▒': 0.5, '░': 0.25}
+BAYER_4X4 = np.array([[0, 8, 2, 10], [12, 4, 14, 6], [3, 11, 1, 9], [15, 7, 13, 5]]) / 16
+GLYPH_COLOR = (0, 255, 0)  # Lime, in BGR
+
+def draw_glyph_cv2(char, char_width, char_height):
+    """Rasterize one char into a BGR tile with OpenCV - fallback when Pillow is missing"""
+    tile = np.zeros((char_height, char_width, 3), dtype=np.uint8)
+    if char in BLOCK_SHADES:
+        # Hershey fonts are ASCII-only, so shade blocks with an ordered dither
+        ys, xs = np.indices((char_height, char_width))
+        tile[BAYER_4X4[ys % 4, xs % 4] < BLOCK_SHADES[char]] = GLYPH_COLOR
+    elif char.strip():
+        font = cv2.FONT_HERSHEY_SIMPLEX
+        scale = cv2.getFontScaleFromHeight(font, max(1, char_height * 2 // 3), 1)
+        (text_width, _), baseline = cv2.getTextSize(char, font, scale, 1)
+        origin = ((char_width - text_width) // 2, char_height - baseline - 1)
+        cv2.putText(tile, char, origin, font, scale, GLYPH_COLOR, 1, cv2.LINE_AA)
+    return tile
+
+@functools.lru_cache(maxsize=16)
+def build_glyph_atlas(charset, font_size):
+    """Rasterize every charset character once into a (chars, cell_h, cell_w, 3) BGR array"""
+    char_width = max(1, round(font_size * 0.6))  # Estimate character width
+    char_height = int(font_size * 1.2)  # Line height
+    
+    glyphs = np.zeros((len(charset), char_height, char_width, 3), dtype=np.uint8)
+    if not PIL_SUPPORT:
+        for i, char in enumerate(charset):
+            glyphs[i] = draw_glyph_cv2(char, char_width, char_height)
+        return glyphs
+        
+    font = load_font(font_size)
+    for i, char in enumerate(charset):
+        tile = Image.new('RGB', (char_width, char_height), color='black')
+        ImageDraw.Draw(tile).text((0, 0), char, fill='lime', font=font)
+        # Store glyphs in OpenCV's BGR order so rendered frames need no conversion
+        glyphs[i] = np.array(tile)[:, :, ::-1]
+        
+    return glyphs
+
+if NUMBA_SUPPORT:
+    @njit(parallel=True, cache=True)
+    def blit_glyphs(text_area, glyphs, index_lut, gray):
+        """Map each cell's gray value to its glyph and copy it into the text area, rows in parallel"""
+        rows, cols = gray.shape
+        char_height, char_width = glyphs.shape[1], glyphs.shape[2]
+        for y in prange(rows):
+            y0 = y * char_height
+            for x in range(cols):
+                x0 = x * char_width
+                text_area[y0:y0 + char_height, x0:x0 + char_width] = glyphs[index_lut[gray[y, x]]]
+
+def frame_to_gray(frame, grid_size, gray_full=None):
+    """Downscale a decoded frame to one gray value per ASCII cell
+    
+    Runs in the decode thread (OpenCV releases the GIL), so only the small
+    grid is sent to a render worker instead of the full-resolution frame.
+    """
+    # Convert to grayscale first so the resize only touches one channel
+    if len(frame.shape) == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray_full)
+        
+    # Resize frame - box filter averages each cell's pixels instead of sampling 4 taps
+    return cv2.resize(frame, grid_size, interpolation=cv2.INTER_AREA)
+
+class RenderContext:
+    """ASCII grid geometry, lookup tables and reusable buffers for rendering one job's frames
+    
+    Buffers are sized once from the first frame for up to batch_size frames and
+    written with dst=/out= on every call, so the hot loop allocates nothing.
+    Results are overwritten by the next call.
+    """
+    @staticmethod
+    def grid_height(frame_shape, ascii_width):
+        """Rows of the ASCII grid for a frame, corrected for the tall character cells"""
+        height, width_orig = frame_shape[:2]
+        return int(ascii_width * (height / width_orig) * 0.45)
+        
+    @staticmethod
+    def canvas_size(grid_shape, cell_shape):
+        """(height, width) of the output frames for a grid of cell_shape glyph cells"""
+        img_height = grid_shape[0] * cell_shape[0] + 2 * ASCII_MARGIN
+        img_width = grid_shape[1] * cell_shape[1] + 2 * ASCII_MARGIN
+        # H.264 with yuv420p needs even dimensions - pad the right/bottom border
+        return img_height + img_height % 2, img_width + img_width % 2
+        
+    def __init__(self, grid_shape, index_lut, glyphs=None, batch_size=1):
+        ascii_height, ascii_width = grid_shape
+        self.ascii_height, self.ascii_width = grid_shape
+        self.index_lut = index_lut
+        
+        # Batch buffers are laid out frame-major, so a batch's gray values and
+        # indices are each one contiguous block
+        self.gray = np.empty((batch_size, self.ascii_height, ascii_width), dtype=np.uint8)
+        self.idx = np.empty((batch_size, self.ascii_height, ascii_width), dtype=np.uint8)
+        
+        self.glyphs = glyphs
+        if glyphs is not None:
+            char_height, char_width = glyphs.shape[1:3]
+            text_height = self.ascii_height * char_height
+            text_width = ascii_width * char_width
+            if not NUMBA_SUPPORT:
+                self.tiles = np.empty((batch_size, self.ascii_height, ascii_width) + glyphs.shape[1:], dtype=np.uint8)
+            self.canvases = np.zeros((batch_size,) + self.canvas_size(grid_shape, glyphs.shape[1:3]) + (3,), dtype=np.uint8)
+            
+            # View each text area as a (rows, cell_h, cols, cell_w, 3) grid of cells so the
+            # gathered tiles of a whole batch are scattered into place in one strided copy
+            self.text_areas = self.canvases[:, ASCII_MARGIN:ASCII_MARGIN + text_height, ASCII_MARGIN:ASCII_MARGIN + text_width]
+            self.cells = self.text_areas.reshape(batch_size, self.ascii_height, char_height, ascii_width, char_width, 3)
+            
+    def frames_to_indices(self, count):
+        """Map the first count gray grids to charset indices in one table lookup pass"""
+        # Apply contrast and map pixels to char indices for the whole batch at once
+        gray = self.gray[:count].reshape(count * self.ascii_height, self.ascii_width)
+        idx = self.idx[:count].reshape(count * self.ascii_height, self.ascii_width)
+        cv2.LUT(gray, self.index_lut, dst=idx)
+        return self.idx[:count]
+        
+    def render_frames(self, grays):
+        """Render a batch of downscaled gray grids to the (reused) BGR canvases"""
+        count = len(grays)
+        if NUMBA_SUPPORT:
+            # The JIT kernel does the char lookup while blitting - no index grid pass
+            for slot, gray in enumerate(grays):
+                blit_glyphs(self.text_areas[slot], self.glyphs, self.index_lut, gray)
+        else:
+            # One gather and one scatter for the whole batch - only the text areas
+            # are redrawn, the margins stay black from allocation
+            for slot, gray in enumerate(grays):
+                np.copyto(self.gray[slot], gray)
+            tiles = self.tiles[:count]
+            np.take(self.glyphs, self.frames_to_indices(count), axis=0, out=tiles, mode='clip')
+            np.copyto(self.cells[:count], tiles.transpose(0, 1, 3, 2, 4, 5))
+            
+        return self.canvases[:count]
+
+# Per-process render settings, set up once by init_render_worker
+_render_state = {}
+
+def init_render_worker(grid_shape, charset, contrast, font_size):
+    """Set up a render worker process's lookup tables, glyph atlas and buffers"""
+    glyphs = build_glyph_atlas(charset, font_size)
+    _render_state['context'] = RenderContext(grid_shape, get_index_lut(charset, contrast),
+                                             glyphs, batch_size=RENDER_BATCH_SIZE)
+    if NUMBA_SUPPORT:
+        # Share the cores with the other render workers instead of each using all of them
+        numba.set_num_threads(max(1, min(numba.config.NUMBA_NUM_THREADS, (os.cpu_count() or 2) // RENDER_WORKERS)))
+
+def render_frames(grays):
+    """Render a batch of downscaled gray grids to BGR ASCII frames in a worker process"""
+    # Glyphs are already BGR, so the batch goes back as one array without conversion.
+    # The canvases are reused for the next batch, which is safe because the result
+    # is pickled back to the parent as soon as this returns.
+    return _render_state['context'].render_frames(grays)
@@ -6,42 +6,178 @@ Konverterer videofiler til ASCII art videoer med original lyd
 
 import cv2
 import numpy as np
-from PIL import Image, ImageDraw, ImageFont
 import os
 import sys
 import subprocess
+import tempfile
 from pathlib import Path
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import threading
+import queue
+import functools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+# Render worker code lives in render.py so pickled tasks refer to a module without
+# side effects; spawn still re-runs this script in each worker, see the __mp_main__ check below
+from render import (PIL_SUPPORT, RENDER_WORKERS, RENDER_BATCH_SIZE, RenderContext, build_glyph_atlas,
+                    frame_to_gray, init_render_worker, render_frames)
 
-# Try to import moviepy for audio, fallback to ffmpeg
-try:
-    from moviepy.editor import VideoFileClip, ImageSequenceClip
-    AUDIO_SUPPORT = True
-    AUDIO_METHOD = "moviepy"
-    AUDIO_ERROR = None
-except ImportError as e:
-    # Try to use ffmpeg directly
-    import subprocess
+# Locate ffmpeg for encoding and audio: prefer the system binary, fall back to the
+# one moviepy installs through imageio-ffmpeg
+def find_ffmpeg():
+    """Return the ffmpeg executable and how it was found, or (None, error)"""
     try:
-        result = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True)
-        if result.returncode == 0:
-            AUDIO_SUPPORT = True
-            AUDIO_METHOD = "ffmpeg"
-            AUDIO_ERROR = None
-        else:
-            AUDIO_SUPPORT = False
-            AUDIO_METHOD = None
-            AUDIO_ERROR = "FFmpeg not found"
+        if subprocess.run(['ffmpeg', '-version'], capture_output=True).returncode == 0:
+            return 'ffmpeg', "ffmpeg"
     except FileNotFoundError:
-        AUDIO_SUPPORT = False
-        AUDIO_METHOD = None
-        AUDIO_ERROR = "Neither moviepy nor ffmpeg available"
-except Exception as e:
-    AUDIO_SUPPORT = False
-    AUDIO_METHOD = None
-    AUDIO_ERROR = f"Unexpected error: {str(e)}"
+        pass
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe(), "imageio-ffmpeg"
+    except ImportError:
+        return None, "Neither moviepy nor ffmpeg available"
+    except Exception as e:
+        return None, f"Unexpected error: {str(e)}"
+
+# Spawned render workers re-run this script as __mp_main__ before they import
+# render.py, so the ffmpeg probe is skipped in them
+if __name__ == '__mp_main__':
+    FFMPEG_BINARY, _ffmpeg_source = None, "Not probed in render workers"
+else:
+    FFMPEG_BINARY, _ffmpeg_source = find_ffmpeg()
+FFMPEG_AVAILABLE = FFMPEG_BINARY is not None
+AUDIO_SUPPORT = FFMPEG_AVAILABLE
+AUDIO_METHOD = _ffmpeg_source if FFMPEG_AVAILABLE else None
+AUDIO_ERROR = None if FFMPEG_AVAILABLE else _ffmpeg_source
+
+# Configuration
+PIPELINE_QUEUE_SIZE = 8  # Frames buffered between decode, render and encode threads
+PROGRESS_POLL_MS = 100  # How often the GUI picks up frame progress
+
+def put_until_stopped(q, item, stop):
+    """Put item on a bounded queue, giving up once the pipeline is stopped"""
+    while True:
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            if stop.is_set():
+                return
+
+# Hardware H.264 encoders in order of preference
+HW_ENCODERS = ['h264_nvenc', 'h264_qsv', 'h264_videotoolbox', 'h264_amf']
+
+# Per-encoder rate control arguments by quality level
+QUALITY_PRESETS = {
+    'libx264': {
+        'high': ('-crf', '18', '-preset', 'medium'),
+        'medium': ('-crf', '23', '-preset', 'fast'),
+        'low': ('-crf', '28', '-preset', 'ultrafast'),
+    },
+    'h264_nvenc': {
+        'high': ('-preset', 'p5', '-rc', 'vbr', '-cq', '19', '-b:v', '0'),
+        'medium': ('-preset', 'p4', '-rc', 'vbr', '-cq', '23', '-b:v', '0'),
+        'low': ('-preset', 'p1', '-rc', 'vbr', '-cq', '28', '-b:v', '0'),
+    },
+    'h264_qsv': {
+        'high': ('-preset', 'medium', '-global_quality', '20'),
+        'medium': ('-preset', 'fast', '-global_quality', '25'),
+        'low': ('-preset', 'veryfast', '-global_quality', '30'),
+    },
+    'h264_videotoolbox': {
+        'high': ('-q:v', '65'),
+        'medium': ('-q:v', '55'),
+        'low': ('-q:v', '45'),
+    },
+    'h264_amf': {
+        'high': ('-quality', 'quality', '-rc', 'cqp', '-qp_i', '18', '-qp_p', '18'),
+        'medium': ('-quality', 'balanced', '-rc', 'cqp', '-qp_i', '23', '-qp_p', '23'),
+        'low': ('-quality', 'speed', '-rc', 'cqp', '-qp_i', '28', '-qp_p', '28'),
+    },
+}
+
+def encoder_works(encoder, args):
+    """Encode a single yuv420p test frame the way a conversion would"""
+    test_cmd = [
+        FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', 'color=black:s=256x256',
+        '-frames:v', '1', '-c:v', encoder, *args, '-pix_fmt', 'yuv420p', '-f', 'null', '-'
+    ]
+    return subprocess.run(test_cmd, capture_output=True).returncode == 0
+
+@functools.lru_cache(maxsize=None)
+def get_hw_encoder():
+    """Find a working hardware H.264 encoder once, or None to use libx264"""
+    if not FFMPEG_AVAILABLE:
+        return None
+    try:
+        result = subprocess.run([FFMPEG_BINARY, '-hide_banner', '-encoders'], capture_output=True, text=True)
+    except FileNotFoundError:
+        return None
+        
+    for encoder in HW_ENCODERS:
+        if encoder not in result.stdout:
+            continue
+        # Encoders can be compiled in without a usable device, and devices don't all
+        # support every rate control mode - try a frame with each quality's real arguments
+        if all(encoder_works(encoder, args) for args in QUALITY_PRESETS[encoder].values()):
+            return encoder
+    return None
+
+def video_encoder_settings(quality):
+    """ffmpeg video codec arguments for the requested quality, preferring a hardware encoder"""
+    encoder = get_hw_encoder() or 'libx264'
+    presets = QUALITY_PRESETS[encoder]
+    return ['-c:v', encoder, *presets.get(quality, presets['medium'])]
+
+class FFmpegWriter:
+    """Encode raw BGR frames by piping them into ffmpeg - a drop-in for cv2.VideoWriter"""
+    def __init__(self, cmd):
+        self.stderr = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self.stderr)
+        
+    def isOpened(self):
+        return self.proc.poll() is None
+        
+    def write(self, frame):
+        try:
+            self.proc.stdin.write(frame.data)
+        except BrokenPipeError:
+            self.proc.wait()
+            raise Exception(f"ffmpeg encoder exited: {self.error_output()}")
+            
+    def release(self):
+        """Finish encoding and raise if ffmpeg failed"""
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self.proc.wait()
+        if returncode != 0:
+            raise Exception(f"ffmpeg encoder failed: {self.error_output()}")
+        self.stderr.close()
+        
+    def kill(self):
+        """Abort encoding, e.g. after a failed conversion"""
+        if self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait()
+        self.stderr.close()
+        
+    def error_output(self):
+        self.stderr.seek(0)
+        return self.stderr.read().decode(errors='replace').strip()
+
+def get_until_stopped(q, stop):
+    """Get an item from a queue, returning None once the pipeline is stopped"""
+    while True:
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                return None
 
 class ASCIIVideoConverter:
     def __init__(self):
@@ -52,7 +188,18 @@ class ASCIIVideoConverter:
             'blocks': '████▓▓▓▒▒▒░░░   '
         }
         
+        # (frames done, total frames) published by the conversion thread, shown by poll_progress
+        self.frame_progress = None
+        
+        # (succeeded, status, result, message) published once by the conversion thread
+        # when it is done - poll_progress shows it and stops polling
+        self.conversion_outcome = None
+        
+        # Log lines from any thread, written to the log widget by flush_log on the Tk main loop
+        self.log_queue = queue.Queue()
+        
         self.setup_gui()
+        self.root.after(PROGRESS_POLL_MS, self.flush_log)
         
     def setup_gui(self):
         """Setup the GUI"""
@@ -211,10 +358,21 @@ class ASCIIVideoConverter:
         self.log("4. Click Convert")
         
     def log(self, message):
-        """Add message to log"""
-        self.log_text.insert(tk.END, f"{message}\n")
-        self.log_text.see(tk.END)
-        self.root.update()
+        """Add message to log - safe to call from the conversion thread"""
+        self.log_queue.put(message)
+        
+    def flush_log(self):
+        """Write queued log lines to the log widget in one go - runs on the Tk main loop"""
+        lines = []
+        while True:
+            try:
+                lines.append(self.log_queue.get_nowait())
+            except queue.Empty:
+                break
+        if lines:
+            self.log_text.insert(tk.END, ''.join(f"{line}\n" for line in lines))
+            self.log_text.see(tk.END)
+        self.root.after(PROGRESS_POLL_MS, self.flush_log)
         
     def update_width_label(self, value):
         self.width_label.config(text=str(int(float(value))))
@@ -238,86 +396,21 @@ class ASCIIVideoConverter:
             self.file_var.set(file_path)
             self.log(f"Selected: {os.path.basename(file_path)}")
             
-    def frame_to_ascii(self, frame, width, charset, contrast):
-        """Convert a video frame to ASCII art"""
-        # Resize frame
-        height, width_orig = frame.shape[:2]
-        aspect_ratio = height / width_orig
-        ascii_height = int(width * aspect_ratio * 0.45)
-        
-        frame_resized = cv2.resize(frame, (width, ascii_height))
-        
-        # Convert to grayscale
-        if len(frame_resized.shape) == 3:
-            gray = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = frame_resized
-            
-        # Apply contrast
-        gray = cv2.convertScaleAbs(gray, alpha=contrast, beta=0)
-        
-        # Convert to ASCII
-        ascii_lines = []
-        for y in range(ascii_height):
-            row = []
-            for x in range(width):
-                pixel_value = gray[y, x]
-                char_index = int((pixel_value / 255) * (len(charset) - 1))
-                row.append(charset[char_index])
-            ascii_lines.append(''.join(row))
-            
-        return ascii_lines
-        
-    def ascii_to_image(self, ascii_lines, font_size):
-        """Convert ASCII text to image"""
-        # Calculate image size
-        max_width = max(len(line) for line in ascii_lines)
-        char_width = font_size * 0.6  # Estimate character width
-        char_height = font_size * 1.2  # Line height
-        
-        img_width = int(max_width * char_width) + 20
-        img_height = int(len(ascii_lines) * char_height) + 20
-        
-        # Create image
-        img = Image.new('RGB', (img_width, img_height), color='black')
-        draw = ImageDraw.Draw(img)
-        
-        # Try to load font
-        try:
-            # Try different font names
-            for font_name in ["consola.ttf", "cour.ttf", "arial.ttf"]:
-                try:
-                    font = ImageFont.truetype(font_name, font_size)
-                    break
-                except:
-                    continue
-            else:
-                font = ImageFont.load_default()
-        except:
-            font = ImageFont.load_default()
-        
-        # Draw ASCII text
-        y_pos = 10
-        for line in ascii_lines:
-            draw.text((10, y_pos), line, fill='lime', font=font)
-            y_pos += int(char_height)
-            
-        return np.array(img)
-        
     def convert_video(self):
         """Convert video to ASCII"""
         input_path = self.file_var.get().strip()
         
         if not input_path:
-            messagebox.showerror("Error", "Please select a video file first!")
             self.log("ERROR: No file selected")
+            self.conversion_outcome = (False, None, "", "Please select a video file first!")
             return
             
         if not os.path.exists(input_path):
-            messagebox.showerror("Error", f"File not found: {input_path}")
             self.log(f"ERROR: File not found: {input_path}")
+            self.conversion_outcome = (False, None, "", f"File not found: {input_path}")
             return
             
+        out = None
         try:
             self.log(f"Starting conversion of: {os.path.basename(input_path)}")
             
@@ -351,25 +444,23 @@ class ASCIIVideoConverter:
                 
             # Create output filename
             input_file = Path(input_path)
-            temp_video_path = input_file.parent / f"{input_file.stem}_ascii_temp.mp4"
             final_output_path = input_file.parent / f"{input_file.stem}_ascii.mp4"
             
             self.log(f"Output will be: {final_output_path.name}")
             
             # Get first frame to determine output size
-            ret, frame = cap.read()
+            ret, first_frame = cap.read()
             if not ret:
                 raise Exception("Could not read first frame")
                 
-            ascii_lines = self.frame_to_ascii(frame, ascii_width, charset, contrast)
-            ascii_img = self.ascii_to_image(ascii_lines, font_size)
-            output_height, output_width = ascii_img.shape[:2]
+            # Size the output from the grid and the atlas cells - the render workers
+            # allocate the actual buffers
+            ascii_height = RenderContext.grid_height(first_frame.shape, ascii_width)
+            cell_shape = build_glyph_atlas(charset, font_size).shape[1:3]
+            output_height, output_width = RenderContext.canvas_size((ascii_height, ascii_width), cell_shape)
             
             self.log(f"Output video size: {output_width}x{output_height}")
             
-            # Setup video writer with automatic codec fallback
-            self.log(f"Creating MP4 video with {quality} quality...")
-            
             # Choose FPS based on quality
             if quality == 'high':
                 actual_fps = fps
@@ -377,211 +468,222 @@ class ASCIIVideoConverter:
                 actual_fps = min(fps, 25)
             else:  # low
                 actual_fps = min(fps, 20)
+                
+            use_ffmpeg = FFMPEG_AVAILABLE
+            if use_ffmpeg:
+                # Pipe raw frames into a single ffmpeg process that encodes H.264 and
+                # adds the original audio - no temporary file and no second encode
+                encoder = get_hw_encoder() or 'libx264'
+                self.log(f"Creating MP4 video with {quality} quality using ffmpeg ({encoder})...")
+                ffmpeg_cmd = [
+                    FFMPEG_BINARY, '-y',  # -y to overwrite output
+                    '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+                    '-s', f"{output_width}x{output_height}", '-r', str(fps),
+                    '-i', '-',  # ASCII frames on stdin
+                ]
+                if include_audio and AUDIO_SUPPORT:
+                    ffmpeg_cmd += [
+                        '-i', input_path,  # Original video with audio
+                        '-map', '0:v:0',  # Take video from first input (ASCII)
+                        '-map', '1:a:0?',  # Take audio from second input, if it has any
+                        '-c:a', 'aac',   # AAC audio codec
+                        '-b:a', '128k',  # Audio bitrate
+                        '-shortest',  # Match shortest stream
+                    ]
+                ffmpeg_cmd += video_encoder_settings(quality) + [
+                    '-pix_fmt', 'yuv420p',  # Playable everywhere
+                    '-r', str(actual_fps),  # Drop frames down to the quality's frame rate
+                    '-movflags', '+faststart',  # Optimize for web playback
+                    str(final_output_path)
+                ]
+                out = FFmpegWriter(ffmpeg_cmd)
+                if not out.isOpened():
+                    raise Exception(f"Could not start ffmpeg: {out.error_output()}")
+                used_codec = f"ffmpeg {encoder}"
+            else:
+                # Setup video writer with automatic codec fallback
+                self.log(f"Creating MP4 video with {quality} quality...")
+                
+                # Try different codecs in order of preference
+                codecs_to_try = [
+                    ('mp4v', 'MP4V-ES'),  # Most compatible on Windows
+                    ('XVID', 'XVID'),     # Good fallback
+                    ('MJPG', 'MJPG'),     # Always works
+                ]
+                
+                used_codec = None
+                
+                for codec_fourcc, codec_name in codecs_to_try:
+                    try:
+                        fourcc = cv2.VideoWriter_fourcc(*codec_fourcc)
+                        out = cv2.VideoWriter(str(final_output_path), fourcc, actual_fps, 
+                                            (output_width, output_height))
+                        
+                        if out.isOpened():
+                            used_codec = codec_name
+                            self.log(f"✅ Using {codec_name} codec for MP4 video")
+                            break
+                        else:
+                            out.release()
+                            out = None
+                            self.log(f"⚠ {codec_name} codec failed, trying next...")
+                            
+                    except Exception as e:
+                        self.log(f"⚠ {codec_name} codec error: {e}")
+                        if out:
+                            out.release()
+                            out = None
+                
+                if not out or not out.isOpened():
+                    raise Exception("Could not create MP4 video file - no compatible codec found")
+                    
+            self.log(f"MP4 video writer ready: {output_width}x{output_height} @ {actual_fps:.1f} FPS using {used_codec}")
             
-            # Try different codecs in order of preference
-            codecs_to_try = [
-                ('mp4v', 'MP4V-ES'),  # Most compatible on Windows
-                ('XVID', 'XVID'),     # Good fallback
-                ('MJPG', 'MJPG'),     # Always works
-            ]
+            frame_count = 0
             
-            out = None
-            used_codec = None
+            # Decode, ASCII-render and encode run concurrently: a reader thread feeds
+            # downscaled gray grids to this thread, which hands rendered frames to a
+            # writer thread. Bounded queues keep memory constant when one stage falls behind.
+            read_q = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            write_q = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            stop = threading.Event()
+            errors = []
             
-            for codec_fourcc, codec_name in codecs_to_try:
+            def read_frames():
                 try:
-                    fourcc = cv2.VideoWriter_fourcc(*codec_fourcc)
-                    out = cv2.VideoWriter(str(temp_video_path), fourcc, actual_fps, 
-                                        (output_width, output_height))
+                    # Downscale right after decoding so only the small gray grids are
+                    # queued and pickled to the render workers, not full frames
+                    grid_size = (ascii_width, ascii_height)
+                    gray_full = np.empty(first_frame.shape[:2], dtype=np.uint8)
+                    # Feed the already decoded first frame instead of seeking back to it
+                    put_until_stopped(read_q, frame_to_gray(first_frame, grid_size, gray_full), stop)
+                    while not stop.is_set():
+                        ret, frame = cap.read()
+                        if not ret:
+                            break
+                        put_until_stopped(read_q, frame_to_gray(frame, grid_size, gray_full), stop)
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    put_until_stopped(read_q, None, stop)
                     
-                    if out.isOpened():
-                        used_codec = codec_name
-                        self.log(f"✅ Using {codec_name} codec for MP4 video")
-                        break
-                    else:
-                        out.release()
-                        out = None
-                        self.log(f"⚠ {codec_name} codec failed, trying next...")
-                        
+            def write_frames():
+                try:
+                    while True:
+                        img = get_until_stopped(write_q, stop)
+                        if img is None:
+                            break
+                        out.write(img)
                 except Exception as e:
-                    self.log(f"⚠ {codec_name} codec error: {e}")
-                    if out:
-                        out.release()
-                        out = None
-            
-            if not out or not out.isOpened():
-                raise Exception("Could not create MP4 video file - no compatible codec found")
-                
-            self.log(f"MP4 video writer ready: {output_width}x{output_height} @ {actual_fps:.1f} FPS using {used_codec}")
-            
-            # Reset video to beginning
-            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            
-            frame_count = 0
+                    errors.append(e)
+                    stop.set()
+                    
+            # Render gray grids in worker processes. Futures are collected in submission
+            # order and only a bounded window is in flight, so frames reach the writer
+            # in sequence without the whole video being queued up front.
+            executor = ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_render_worker,
+                initargs=((ascii_height, ascii_width), charset, contrast, font_size)
+            )
+            pending = deque()
+            
+            reader = threading.Thread(target=read_frames, daemon=True)
+            writer = threading.Thread(target=write_frames, daemon=True)
+            reader.start()
+            writer.start()
+            
+            def write_batch(future):
+                nonlocal frame_count
+                for ascii_img_bgr in future.result():
+                    # Hand frame to writer thread
+                    put_until_stopped(write_q, ascii_img_bgr, stop)
+                    
+                    frame_count += 1
+                    self.frame_progress = (frame_count, total_frames)
+                    
+                    if frame_count % 30 == 0:  # Log every 30 frames
+                        progress = (frame_count / total_frames) * 50  # First 50% for video generation
+                        self.log(f"Generated {frame_count}/{total_frames} ASCII frames ({progress:.1f}%)")
             
             # Generate ASCII video frames
-            self.log("Generating ASCII video frames...")
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                    
-                # Convert frame to ASCII
-                ascii_lines = self.frame_to_ascii(frame, ascii_width, charset, contrast)
-                ascii_img = self.ascii_to_image(ascii_lines, font_size)
-                
-                # Convert RGB to BGR for OpenCV
-                ascii_img_bgr = cv2.cvtColor(ascii_img, cv2.COLOR_RGB2BGR)
-                
-                # Write frame
-                out.write(ascii_img_bgr)
+            self.log(f"Generating ASCII video frames using {RENDER_WORKERS} render workers...")
+            try:
+                finished = False
+                while not finished and not stop.is_set():
+                    batch = []
+                    while len(batch) < RENDER_BATCH_SIZE:
+                        gray = get_until_stopped(read_q, stop)
+                        if gray is None:
+                            finished = True
+                            break
+                        batch.append(gray)
+                        
+                    if batch:
+                        pending.append(executor.submit(render_frames, batch))
+                        
+                    while pending and (finished or len(pending) >= 2 * RENDER_WORKERS):
+                        write_batch(pending.popleft())
+            except Exception:
+                stop.set()
+                raise
+            finally:
+                for future in pending:
+                    future.cancel()
+                executor.shutdown(wait=True)
+                put_until_stopped(write_q, None, stop)
+                reader.join()
+                writer.join()
                 
-                frame_count += 1
-                progress = (frame_count / total_frames) * 50  # First 50% for video generation
-                self.progress_var.set(progress)
-                self.status_var.set(f"Generating ASCII frames {frame_count}/{total_frames} ({progress:.1f}%)")
-                
-                if frame_count % 30 == 0:  # Log every 30 frames
-                    self.log(f"Generated {frame_count}/{total_frames} ASCII frames ({progress:.1f}%)")
-                    
-                self.root.update()
+            if errors:
+                raise errors[0]
                 
             # Cleanup video capture and writer
             cap.release()
             out.release()
             
-            self.log(f"ASCII video frames generated: {temp_video_path.name}")
-            
-            # Add audio if requested and supported
-            if include_audio and AUDIO_SUPPORT:
-                self.log(f"Adding original audio using {AUDIO_METHOD}...")
-                self.status_var.set("Adding audio to ASCII video...")
-                self.progress_var.set(75)
-                self.root.update()
-                
-                try:
-                    if AUDIO_METHOD == "moviepy":
-                        # Use moviepy method
-                        original_clip = VideoFileClip(input_path)
-                        ascii_clip = VideoFileClip(str(temp_video_path))
-                        
-                        if original_clip.audio is not None:
-                            ascii_with_audio = ascii_clip.set_audio(original_clip.audio)
-                            ascii_with_audio.write_videofile(
-                                str(final_output_path),
-                                codec='libx264',
-                                audio_codec='aac',
-                                verbose=False,
-                                logger=None
-                            )
-                            ascii_with_audio.close()
-                            self.log("✅ Audio successfully added using moviepy!")
-                        else:
-                            temp_video_path.rename(final_output_path)
-                            self.log("ℹ Original video has no audio")
-                            
-                        original_clip.close()
-                        ascii_clip.close()
-                        
-                    elif AUDIO_METHOD == "ffmpeg":
-                        # Use ffmpeg directly with high-quality MP4 settings
-                        self.log("Using ffmpeg to create high-quality MP4 with audio...")
-                        
-                        # Quality settings based on user choice
-                        if quality == 'high':
-                            video_settings = ['-c:v', 'libx264', '-crf', '18', '-preset', 'medium']
-                        elif quality == 'medium':
-                            video_settings = ['-c:v', 'libx264', '-crf', '23', '-preset', 'fast']
-                        else:  # low
-                            video_settings = ['-c:v', 'libx264', '-crf', '28', '-preset', 'ultrafast']
-                        
-                        ffmpeg_cmd = [
-                            'ffmpeg', '-y',  # -y to overwrite output
-                            '-i', str(temp_video_path),  # ASCII video input
-                            '-i', input_path,  # Original video with audio
-                        ] + video_settings + [
-                            '-c:a', 'aac',   # AAC audio codec
-                            '-b:a', '128k',  # Audio bitrate
-                            '-map', '0:v:0',  # Take video from first input (ASCII)
-                            '-map', '1:a:0',  # Take audio from second input (original)
-                            '-shortest',  # Match shortest stream
-                            '-movflags', '+faststart',  # Optimize for web playback
-                            str(final_output_path)
-                        ]
-                        
-                        result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True)
-                        
-                        if result.returncode == 0:
-                            self.log("✅ High-quality MP4 with audio created using ffmpeg!")
-                        else:
-                            # Try simpler command if complex one fails
-                            self.log(f"⚠ Advanced FFmpeg failed, trying simple method...")
-                            simple_cmd = [
-                                'ffmpeg', '-y',
-                                '-i', str(temp_video_path),
-                                '-i', input_path,
-                                '-c:v', 'libx264',  # Force H.264 in ffmpeg
-                                '-c:a', 'aac',
-                                '-map', '0:v:0',
-                                '-map', '1:a:0',
-                                '-shortest',
-                                str(final_output_path)
-                            ]
-                            result = subprocess.run(simple_cmd, capture_output=True, text=True)
-                            
-                            if result.returncode == 0:
-                                self.log("✅ MP4 with audio created using simple ffmpeg!")
-                            else:
-                                self.log(f"⚠ FFmpeg audio failed: {result.stderr}")
-                                self.log("Saving video without audio...")
-                                temp_video_path.rename(final_output_path)
-                    
-                    # Remove temporary file
-                    if temp_video_path.exists():
-                        temp_video_path.unlink()
-                        
-                except Exception as audio_error:
-                    self.log(f"⚠ Audio processing failed: {audio_error}")
-                    self.log("Saving video without audio...")
-                    if temp_video_path.exists():
-                        temp_video_path.rename(final_output_path)
-            else:
-                # No audio requested, just rename temp file
-                temp_video_path.rename(final_output_path)
+            if use_ffmpeg and include_audio and AUDIO_SUPPORT:
+                self.log("✅ High-quality MP4 with audio created using ffmpeg!")
+            elif use_ffmpeg:
+                self.log("✅ High-quality MP4 created using ffmpeg!")
                 if not include_audio:
                     self.log("Audio not requested - video only")
+            else:
+                self.log("⚠ ffmpeg not available - saved video only")
                 
-            self.progress_var.set(100)
-            self.status_var.set("Conversion completed!")
-            self.result_var.set(f"✅ ASCII video saved: {final_output_path.name}")
             self.log(f"SUCCESS: ASCII video created!")
             self.log(f"File saved as: {final_output_path}")
             
-            # Show result message
-            audio_msg = " with original audio" if (include_audio and AUDIO_SUPPORT) else ""
-            quality_msg = f" ({quality} quality MP4)"
-            messagebox.showinfo("Success", f"ASCII video created successfully{audio_msg}!\n\nSaved as: {final_output_path.name}{quality_msg}")
-            
             # Show file info
             if final_output_path.exists():
                 file_size = final_output_path.stat().st_size / (1024 * 1024)  # MB
                 self.log(f"Final MP4 file size: {file_size:.1f} MB")
+                
+            # Show result message
+            audio_msg = " with original audio" if (include_audio and AUDIO_SUPPORT) else ""
+            quality_msg = f" ({quality} quality MP4)"
+            self.conversion_outcome = (
+                True, "Conversion completed!", f"✅ ASCII video saved: {final_output_path.name}",
+                f"ASCII video created successfully{audio_msg}!\n\nSaved as: {final_output_path.name}{quality_msg}"
+            )
             
         except Exception as e:
             error_msg = f"Conversion failed: {str(e)}"
             self.log(f"ERROR: {error_msg}")
-            messagebox.showerror("Error", error_msg)
-            self.status_var.set("Conversion failed")
             
-            # Cleanup temp file if it exists
+            # Stop the encoder and remove the partial video if one was started
+            if isinstance(out, FFmpegWriter):
+                out.kill()
+            elif out is not None:
+                out.release()
             try:
-                if 'temp_video_path' in locals() and temp_video_path.exists():
-                    temp_video_path.unlink()
+                if out is not None and final_output_path.exists():
+                    final_output_path.unlink()
             except:
                 pass
-            
-        finally:
-            self.convert_btn.config(state='normal')
+                
+            self.conversion_outcome = (False, "Conversion failed", "", error_msg)
             
     def start_conversion(self):
         """Start conversion in separate thread"""
@@ -594,10 +696,46 @@ class ASCIIVideoConverter:
         self.result_var.set("")
         
         # Run conversion in thread
+        self.frame_progress = None
+        self.conversion_outcome = None
         thread = threading.Thread(target=self.convert_video)
         thread.daemon = True
         thread.start()
-        
+        self.root.after(PROGRESS_POLL_MS, self.poll_progress, thread, None)
+        
+    def poll_progress(self, thread, shown):
+        """Show frame progress and the final outcome of the conversion thread - runs on the Tk main loop"""
+        # Check liveness first: once the thread is gone its outcome is guaranteed visible
+        alive = thread.is_alive()
+        if self.conversion_outcome is not None:
+            self.show_outcome(*self.conversion_outcome)
+            return
+            
+        current = self.frame_progress
+        if current is not None and current != shown:
+            frame_count, total_frames = current
+            progress = (frame_count / total_frames) * 50  # First 50% for video generation
+            self.progress_var.set(progress)
+            self.status_var.set(f"Generating ASCII frames {frame_count}/{total_frames} ({progress:.1f}%)")
+            
+        if alive:
+            self.root.after(PROGRESS_POLL_MS, self.poll_progress, thread, current)
+        else:
+            self.convert_btn.config(state='normal')
+            
+    def show_outcome(self, succeeded, status, result, message):
+        """Show a finished conversion and re-enable the convert button"""
+        if succeeded:
+            self.progress_var.set(100)
+        if status is not None:
+            self.status_var.set(status)
+        self.result_var.set(result)
+        self.convert_btn.config(state='normal')
+        if succeeded:
+            messagebox.showinfo("Success", message)
+        else:
+            messagebox.showerror("Error", message)
+            
     def run(self):
         """Run the application"""
         self.root.mainloop()
@@ -622,14 +760,16 @@ def main():
         # GUI mode
         try:
             import cv2
-            import PIL
-            print("✅ Core packages found (opencv-python, pillow)")
+            print("✅ Core packages found (opencv-python)")
         except ImportError as e:
             print(f"❌ Missing required package: {e}")
             print("\nInstall required packages with:")
-            print("pip install opencv-python pillow")
+            print("pip install opencv-python")
             input("Press Enter to exit...")
             return
+            
+        if not PIL_SUPPORT:
+            print("ℹ Pillow not found - drawing glyphs with OpenCV's built-in font")
         
         if AUDIO_SUPPORT:
             print(f"✅ Audio support available using {AUDIO_METHOD}")